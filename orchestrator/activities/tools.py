@@ -32,7 +32,7 @@ from uuid import uuid4
 
 import instructor
 from litellm import acompletion
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from supabase import Client, create_client
 from temporalio import activity
 
@@ -77,7 +77,14 @@ async def setup_activities(
         similarity_threshold=float(os.getenv("CACHE_SIMILARITY_THRESHOLD", "0.85")),
     )
     await _semantic_cache.initialize()
-    activity.logger.info("✓ Semantic cache initialized")
+
+    # Warm the in-process L0 hot-template index and keep it fresh
+    hot_limit = int(os.getenv("CACHE_HOT_TEMPLATE_LIMIT", "500"))
+    hot_refresh_seconds = float(os.getenv("CACHE_HOT_TEMPLATE_REFRESH_SECONDS", "300"))
+    hot_count = await _semantic_cache.refresh_hot_templates(hot_limit)
+    if hot_limit > 0 and hot_refresh_seconds > 0:
+        _semantic_cache.start_hot_template_refresh(hot_refresh_seconds, hot_limit)
+    activity.logger.info(f"✓ Semantic cache initialized ({hot_count} hot templates)")
 
 
 # ============================================================================
@@ -86,10 +93,16 @@ async def setup_activities(
 
 
 @activity.defn(name="check_semantic_cache")
-async def check_semantic_cache(goal: str) -> Optional[dict[str, Any]]:
+async def check_semantic_cache(
+    goal: str, normalized_goal: Optional[str] = None
+) -> Optional[dict[str, Any]]:
     """
     Check semantic cache for existing plan template.
 
+    Args:
+        goal: User's goal as submitted (used for entity extraction + embedding)
+        normalized_goal: Normalized goal from the workflow (used for exact-match keys)
+
     Returns:
         Cached plan with injected parameters if hit, else None
 
@@ -102,11 +115,12 @@ async def check_semantic_cache(goal: str) -> Optional[dict[str, Any]]:
 
     activity.logger.info(f"Checking semantic cache for: {goal}")
 
-    cached = await _semantic_cache.get_plan(goal)
+    cached = await _semantic_cache.get_plan(goal, normalized_goal=normalized_goal)
 
     if cached:
         activity.logger.info(
-            f"✓ Cache HIT (similarity={cached.similarity_score:.3f}, template={cached.template_id})"
+            f"✓ Cache HIT {cached.cache_tier.upper()} "
+            f"(similarity={cached.similarity_score:.3f}, template={cached.template_id})"
         )
         # Convert Pydantic model to dict for workflow
         return cached.model_dump()
@@ -122,9 +136,13 @@ class PlanStep(BaseModel):
     name: str
     tool: str
     input: dict[str, Any]
-    depends_on: list[str] = []
+    # Required: steps run concurrently unless ordered here, so the LLM must state it
+    depends_on: list[str] = Field(
+        ..., description="IDs of steps that must complete first ([] only if fully independent)"
+    )
     compensation: Optional[str] = None
     compensation_input: Optional[dict[str, Any]] = None
+    compensation_independent: bool = False
 
 
 class GeneratedPlan(BaseModel):
@@ -163,17 +181,21 @@ async def generate_plan_with_llm(goal: str, context: dict[str, Any]) -> dict[str
     system_prompt = """You are an AI task planner. Given a user goal, generate an execution plan.
 
 Rules:
-1. Break goal into sequential steps (each step = one tool call)
-2. Define dependencies (steps that must complete before this one)
+1. Break goal into steps (each step = one tool call) with unique ids
+2. Set depends_on on EVERY step: the ids of steps that must complete before it.
+   Steps are executed concurrently unless ordered by depends_on - use [] only for
+   steps that need nothing from any other step
 3. Assign compensation activities for reversible actions
+   (set compensation_independent=true if it doesn't conflict with other rollbacks)
 4. Use available tools: search_database, send_email, book_flight, create_record, webhook
 
 Example:
 Goal: "Book flight to Paris tomorrow and send confirmation to john@example.com"
 Plan:
-- Step 1: search_flights (to=Paris, date=tomorrow)
-- Step 2: book_flight (flight_id={step1.flight_id}), compensation=cancel_flight
-- Step 3: send_email (to=john@example.com, body=confirmation)
+- step1: search_flights (to=Paris, date=tomorrow), depends_on=[]
+- step2: book_flight (flight_id={step1.flight_id}), depends_on=[step1],
+  compensation=cancel_flight
+- step3: send_email (to=john@example.com, body=confirmation), depends_on=[step2]
 
 Output valid JSON matching the PlanStep schema."""
 
@@ -198,12 +220,15 @@ Output valid JSON matching the PlanStep schema."""
             await _semantic_cache.store_plan(
                 goal=goal,
                 plan_steps=[step.model_dump() for step in plan.steps],
+                explicit_dependencies=True,
             )
 
         # Return as dict for workflow
         return {
             "plan_id": plan.plan_id,
             "steps": [step.model_dump() for step in plan.steps],
+            # depends_on is required by PlanStep - steps may run as concurrent waves
+            "explicit_dependencies": True,
         }
 
     except Exception as e:
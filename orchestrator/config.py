@@ -49,6 +49,12 @@ class Settings(BaseSettings):
         default=0.85, description="Minimum similarity for cache hit"
     )
     cache_ttl_seconds: int = Field(default=86400, description="Cache TTL (24h default)")
+    cache_hot_template_limit: int = Field(
+        default=500, description="Top-N templates held in-process (L0, 0 disables)"
+    )
+    cache_hot_template_refresh_seconds: float = Field(
+        default=300, description="L0 hot-template refresh interval (0 disables)"
+    )
 
     # Application Configuration
     log_level: str = Field(default="INFO", description="Logging level")
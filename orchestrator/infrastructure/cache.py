@@ -14,6 +14,12 @@ This module implements intelligent plan caching that goes beyond simple key-valu
 
 4. **TTL Management**: Automatic expiration to prevent stale plans
 
+5. **Tiered Lookup**: L1 exact-match (SHA256 of raw + normalized goal) before L2 vector search
+   - Exact repeats skip the embedding model entirely (~1µs key lookup vs ~10-50ms)
+   - L2 hits backfill L1 under both keys so the next identical goal is served from L1
+   - L0: in-process index of the top-N templates by hit count (no Redis roundtrip at all),
+     refreshed periodically by the worker
+
 Why This Matters:
 - Reduces LLM calls by ~70% for common patterns (major cost + latency savings)
 - Improves consistency (same pattern → same plan structure)
@@ -25,6 +31,7 @@ Architecture:
 - Entity extraction via regex patterns (extensible to NER models)
 """
 
+import asyncio
 import hashlib
 import json
 import re
@@ -33,6 +40,7 @@ from typing import Any, Optional
 import numpy as np
 import redis.asyncio as aioredis
 from pydantic import BaseModel, Field
+from redis.commands.core import AsyncScript
 from redis.commands.search.field import NumericField, TextField, VectorField
 from redis.commands.search.indexDefinition import IndexDefinition, IndexType
 from redis.commands.search.query import Query
@@ -64,6 +72,9 @@ class PlanTemplate(BaseModel):
     )
     embedding: list[float] = Field(..., description="Sentence embedding (384d)")
     hit_count: int = Field(default=0, description="Number of cache hits")
+    explicit_dependencies: bool = Field(
+        default=False, description="Every step declares depends_on (safe to run as waves)"
+    )
     created_at: str = Field(..., description="ISO 8601 timestamp")
     ttl_seconds: int = Field(default=86400, description="Time to live (24h default)")
 
@@ -84,6 +95,10 @@ class CachedPlan(BaseModel):
     parameters: dict[str, str] = Field(..., description="Extracted parameter values")
     cache_hit: bool = Field(default=True)
     similarity_score: float = Field(..., description="Cosine similarity (0-1)")
+    cache_tier: str = Field(default="l2", description="Tier that served the hit (l0/l1/l2)")
+    explicit_dependencies: bool = Field(
+        default=False, description="Every step declares depends_on (safe to run as waves)"
+    )
 
 
 # ============================================================================
@@ -145,7 +160,9 @@ class EntityExtractor:
                     matches.extend(found if isinstance(found[0], str) else [m for m in found if m])
 
             if matches:
-                entities[entity_type] = list(set(matches))  # Deduplicate
+                # Deduplicate in match order (set order varies per process, which
+                # would make template IDs differ between workers)
+                entities[entity_type] = list(dict.fromkeys(matches))
 
         return entities
 
@@ -185,6 +202,15 @@ class EntityExtractor:
 # SEMANTIC CACHE SERVICE
 # ============================================================================
 
+# Count a hit only while the template still exists. A blind HINCRBY on an expired
+# plan:{id} would recreate it as a TTL-less {hit_count: 1} stub.
+_COUNT_HIT_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], 'plan_steps') == 1 then
+    return redis.call('HINCRBY', KEYS[1], 'hit_count', ARGV[1])
+end
+return -1
+"""
+
 
 class SemanticCacheService:
     """
@@ -192,6 +218,7 @@ class SemanticCacheService:
 
     Features:
     - Plan template extraction and caching
+    - L0 in-process hot-template index and L1 exact-match lookup in front of vector search
     - Cosine similarity search using HNSW index
     - Parameter injection for plan rehydration
     - TTL-based expiration
@@ -241,6 +268,7 @@ class SemanticCacheService:
 
         # Redis client (async)
         self.redis: Optional[aioredis.Redis] = None
+        self._count_hit_script: Optional[AsyncScript] = None
 
         # Sentence embeddings model (runs locally, no API calls)
         print(f"Loading embedding model: {embedding_model}...")
@@ -251,6 +279,22 @@ class SemanticCacheService:
         # Redis index name
         self.index_name = "idx:plan_templates"
 
+        # Lookup counters per tier (for tuning similarity_threshold)
+        self.stats: dict[str, int] = {
+            "cache_hit_l0": 0,
+            "cache_hit_l1": 0,
+            "cache_hit_l2": 0,
+            "cache_miss": 0,
+        }
+
+        # L0: hot templates held in-process
+        # (template_id → (parameterized plan_steps, explicit_dependencies)).
+        # Replaced wholesale by refresh_hot_templates(); L0 hits are counted locally
+        # and flushed to Redis hit_count on the next refresh.
+        self._hot_templates: dict[str, tuple[list[dict[str, Any]], bool]] = {}
+        self._pending_l0_hits: dict[str, int] = {}
+        self._hot_refresh_task: Optional[asyncio.Task[None]] = None
+
     async def initialize(self) -> None:
         """
         Initialize Redis connection and create vector search index.
@@ -323,34 +367,73 @@ class SemanticCacheService:
         )
         print(f"✓ Created vector index: {self.index_name}")
 
-    async def get_plan(self, goal: str) -> Optional[CachedPlan]:
+    async def get_plan(
+        self, goal: str, normalized_goal: Optional[str] = None
+    ) -> Optional[CachedPlan]:
         """
         Try to retrieve cached plan for given goal.
 
         Process:
-        1. Extract template from goal: "Book flight to Paris" → "Book flight to {LOCATION}"
-        2. Embed template using sentence-transformers
+        0. Extract template from goal: "Book flight to Paris" → "Book flight to {LOCATION}"
+           - L0: if the template is in the in-process hot index, inject parameters and return
+           - L1: exact-match lookup by SHA256 of raw and normalized goal (one MGET)
+        1. (L2) Embed template using sentence-transformers
         3. Vector search in Redis for similar templates (cosine similarity)
-        4. If similarity >= threshold, inject parameters and return plan
+        4. If similarity >= threshold, inject parameters, backfill L1 and return plan
         5. Else return None (cache miss)
 
         Args:
             goal: User's goal in natural language
+            normalized_goal: Pre-normalized goal (computed via normalize_goal() if None)
 
         Returns:
             CachedPlan if cache hit (similarity >= threshold), else None
+
+        Note: Template extraction and embedding use the raw goal - entity patterns
+        are case-sensitive, and injected parameters should keep the user's casing.
         """
         if not self.redis:
             raise RuntimeError("Redis not initialized")
 
-        # Step 1: Extract template and parameters
+        # Step 0: Extract template and parameters (regex only - cheap)
         template_text, parameters = EntityExtractor.create_template(goal)
 
-        # Step 2: Embed template
+        # L0: in-process hot template (no Redis roundtrip)
+        template_id = self._template_id(template_text)
+        hot_template = self._hot_templates.get(template_id)
+        if hot_template is not None:
+            hot_steps, explicit_dependencies = hot_template
+            self._pending_l0_hits[template_id] = self._pending_l0_hits.get(template_id, 0) + 1
+            self.stats["cache_hit_l0"] += 1
+            return CachedPlan(
+                plan_id=self._generate_plan_id(goal),
+                template_id=template_id,
+                steps=self._inject_parameters(hot_steps, parameters),
+                parameters=parameters,
+                similarity_score=1.0,
+                cache_tier="l0",
+                explicit_dependencies=explicit_dependencies,
+            )
+
+        # L1: exact-match lookup (raw + normalized keys in one roundtrip)
+        if normalized_goal is None:
+            normalized_goal = self.normalize_goal(goal)
+        l1_keys = list(dict.fromkeys([self._l1_key(goal), self._l1_key(normalized_goal)]))
+        l1_entry = next((hit for hit in await self.redis.mget(l1_keys) if hit), None)
+        if l1_entry:
+            entry = json.loads(l1_entry)
+            if await self._count_hit(entry["template_id"]) >= 0:
+                self.stats["cache_hit_l1"] += 1
+                print(f"✓ Cache HIT L1 (template={entry['template_id']})")
+                return CachedPlan(plan_id=self._generate_plan_id(goal), cache_tier="l1", **entry)
+            # Template expired underneath L1 - drop the stale entry and fall through
+            await self.redis.delete(*l1_keys)
+
+        # Step 1: Embed template
         embedding = self.embedding_model.encode(template_text, convert_to_numpy=True)
         embedding_bytes = embedding.astype(np.float32).tobytes()
 
-        # Step 3: Vector similarity search
+        # Step 2: Vector similarity search
         query = (
             Query("*=>[KNN 1 @embedding $vec AS score]")
             .return_fields("template_id", "template_text", "plan_steps", "score")
@@ -364,10 +447,12 @@ class SemanticCacheService:
             )
         except Exception as e:
             print(f"Vector search failed: {e}")
+            self.stats["cache_miss"] += 1
             return None
 
-        # Step 4: Check similarity threshold
+        # Step 3: Check similarity threshold
         if not results.docs:
+            self.stats["cache_miss"] += 1
             return None
 
         best_match = results.docs[0]
@@ -375,23 +460,47 @@ class SemanticCacheService:
 
         if similarity < self.similarity_threshold:
             print(f"❌ Cache miss (similarity={similarity:.3f} < {self.similarity_threshold})")
+            self.stats["cache_miss"] += 1
             return None
 
-        # Step 5: Rehydrate plan with actual parameters
+        # Step 4: Rehydrate plan with actual parameters
         template_id = best_match.template_id
-        plan_steps_json = await self.redis.hget(f"plan:{template_id}", "plan_steps")
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hmget(f"plan:{template_id}", ["plan_steps", "explicit_dependencies"])
+            pipe.pttl(f"plan:{template_id}")
+            (plan_steps_json, explicit_flag), template_pttl = await pipe.execute()
 
         if not plan_steps_json:
+            self.stats["cache_miss"] += 1
             return None
 
         plan_steps = json.loads(plan_steps_json)
+        explicit_dependencies = explicit_flag == "1"  # Missing on pre-DAG templates
 
         # Inject parameters into plan steps
         injected_steps = self._inject_parameters(plan_steps, parameters)
 
-        # Increment hit count
-        await self.redis.hincrby(f"plan:{template_id}", "hit_count", 1)
+        # Backfill L1 and increment hit count in one roundtrip. L1 never outlives the
+        # template (PTTL is -1 if the template has no expiry)
+        l1_ttl_ms = self.ttl_seconds * 1000
+        if template_pttl > 0:
+            l1_ttl_ms = min(l1_ttl_ms, template_pttl)
+        l1_value = json.dumps(
+            {
+                "template_id": template_id,
+                "steps": injected_steps,
+                "parameters": parameters,
+                "similarity_score": similarity,
+                "explicit_dependencies": explicit_dependencies,
+            }
+        )
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for l1_key in l1_keys:
+                pipe.psetex(l1_key, l1_ttl_ms, l1_value)
+            await self._count_hit(template_id, client=pipe)
+            await pipe.execute()
 
+        self.stats["cache_hit_l2"] += 1
         print(f"✓ Cache HIT (similarity={similarity:.3f}, template={template_id})")
 
         return CachedPlan(
@@ -401,6 +510,7 @@ class SemanticCacheService:
             parameters=parameters,
             cache_hit=True,
             similarity_score=similarity,
+            explicit_dependencies=explicit_dependencies,
         )
 
     async def store_plan(
@@ -408,6 +518,7 @@ class SemanticCacheService:
         goal: str,
         plan_steps: list[dict[str, Any]],
         ttl_seconds: Optional[int] = None,
+        explicit_dependencies: bool = False,
     ) -> str:
         """
         Store a new plan in the cache.
@@ -422,6 +533,8 @@ class SemanticCacheService:
             goal: User's original goal
             plan_steps: Generated plan steps
             ttl_seconds: Custom TTL (uses default if None)
+            explicit_dependencies: Every step declares depends_on, so cache hits may run
+                steps concurrently (otherwise they run in plan order)
 
         Returns:
             template_id: Hash of the template (for tracking)
@@ -433,11 +546,14 @@ class SemanticCacheService:
         template_text, parameters = EntityExtractor.create_template(goal)
 
         # Generate template ID (deterministic hash)
-        template_id = hashlib.sha256(template_text.encode()).hexdigest()[:16]
+        template_id = self._template_id(template_text)
 
-        # Check if template already exists
-        exists = await self.redis.exists(f"plan:{template_id}")
-        if exists:
+        # Check if template already exists (a bare hit_count stub doesn't count). A
+        # template without explicit dependencies is replaced by one that has them.
+        cached_steps, cached_flag = await self.redis.hmget(
+            f"plan:{template_id}", ["plan_steps", "explicit_dependencies"]
+        )
+        if cached_steps and (cached_flag == "1" or not explicit_dependencies):
             print(f"✓ Template already cached: {template_id}")
             return template_id
 
@@ -455,6 +571,7 @@ class SemanticCacheService:
             plan_steps=parameterized_steps,
             embedding=embedding.tolist(),
             hit_count=0,
+            explicit_dependencies=explicit_dependencies,
             created_at=self._iso_now(),
             ttl_seconds=ttl_seconds or self.ttl_seconds,
         )
@@ -468,6 +585,7 @@ class SemanticCacheService:
                 "plan_steps": json.dumps(plan_template.plan_steps),
                 "embedding": embedding.astype(np.float32).tobytes(),
                 "hit_count": 0,
+                "explicit_dependencies": int(plan_template.explicit_dependencies),
                 "created_at": plan_template.created_at,
             },
         )
@@ -478,6 +596,90 @@ class SemanticCacheService:
         print(f"✓ Cached new template: {template_id} (TTL={ttl_seconds or self.ttl_seconds}s)")
         return template_id
 
+    async def refresh_hot_templates(self, limit: int = 500) -> int:
+        """
+        Reload the L0 index with the top-N templates by hit count.
+
+        Pending L0 hits are flushed to Redis first, so hot templates keep their rank.
+        On failure the current index is kept (L0 is an optimization, never required).
+
+        Args:
+            limit: Number of templates to hold in-process (0 disables L0)
+
+        Returns:
+            Number of templates in the L0 index
+        """
+        if not self.redis:
+            raise RuntimeError("Redis not initialized")
+
+        # Flush pending L0 hits (expired templates are skipped, not recreated)
+        pending, self._pending_l0_hits = self._pending_l0_hits, {}
+        if pending:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for template_id, hits in pending.items():
+                        await self._count_hit(template_id, hits, client=pipe)
+                    await pipe.execute()
+            except Exception as e:
+                print(f"Hot template hit flush failed: {e}")
+                # Keep the counts for the next refresh (merge hits recorded meanwhile)
+                for template_id, hits in pending.items():
+                    self._pending_l0_hits[template_id] = (
+                        self._pending_l0_hits.get(template_id, 0) + hits
+                    )
+
+        if limit <= 0:
+            self._hot_templates = {}
+            return 0
+
+        try:
+            query = (
+                Query("*")
+                .sort_by("hit_count", asc=False)
+                .return_fields("template_id", "plan_steps", "explicit_dependencies")
+                .paging(0, limit)
+            )
+            results = await self.redis.ft(self.index_name).search(query)
+        except Exception as e:
+            print(f"Hot template refresh failed: {e}")
+            return len(self._hot_templates)
+
+        self._hot_templates = {
+            doc.template_id: (
+                json.loads(doc.plan_steps),
+                getattr(doc, "explicit_dependencies", None) == "1",
+            )
+            for doc in results.docs
+            if getattr(doc, "plan_steps", None)
+        }
+        return len(self._hot_templates)
+
+    def start_hot_template_refresh(self, interval_seconds: float, limit: int = 500) -> None:
+        """Refresh the L0 index every interval_seconds in a background task (until close())."""
+
+        async def _refresh_loop() -> None:
+            while True:
+                await asyncio.sleep(interval_seconds)
+                await self.refresh_hot_templates(limit)
+
+        if self._hot_refresh_task is None:
+            self._hot_refresh_task = asyncio.create_task(_refresh_loop())
+
+    async def _count_hit(self, template_id: str, hits: int = 1, client: Any = None) -> Any:
+        """
+        Add hits to a template's hit_count, only while the template still exists.
+
+        Returns the new hit_count, or -1 if the template expired. With a pipeline
+        as client, the call is queued and the result comes back from execute().
+        """
+        if not self.redis:
+            raise RuntimeError("Redis not initialized")
+        if self._count_hit_script is None:
+            self._count_hit_script = self.redis.register_script(_COUNT_HIT_SCRIPT)
+        return await self._count_hit_script(
+            keys=[f"plan:{template_id}"], args=[hits], client=client
+        )
+
     def _inject_parameters(
         self, plan_steps: list[dict[str, Any]], parameters: dict[str, str]
     ) -> list[dict[str, Any]]:
@@ -521,6 +723,26 @@ class SemanticCacheService:
             parameterized.append(param_step)
         return parameterized
 
+    @staticmethod
+    def normalize_goal(goal: str) -> str:
+        """
+        Normalize goal text: lowercase, collapse whitespace, strip trailing ?.!
+
+        Must match AgentWorkflow._normalize_goal (workflows pass the normalized goal in) -
+        enforced by test_workflow_normalization_matches.
+        """
+        return " ".join(goal.lower().split()).rstrip("?.!")
+
+    @staticmethod
+    def _template_id(template_text: str) -> str:
+        """Template ID: SHA256 of the template text (truncated to 16 hex chars)."""
+        return hashlib.sha256(template_text.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _l1_key(text: str) -> str:
+        """L1 exact-match key: SHA256 of the (raw or normalized) goal text."""
+        return f"l1:{hashlib.sha256(text.encode()).hexdigest()}"
+
     @staticmethod
     def _generate_plan_id(goal: str) -> str:
         """Generate unique plan instance ID."""
@@ -539,7 +761,10 @@ class SemanticCacheService:
         return datetime.utcnow().isoformat() + "Z"
 
     async def close(self) -> None:
-        """Close Redis connection."""
+        """Stop the L0 refresh task and close Redis connection."""
+        if self._hot_refresh_task:
+            self._hot_refresh_task.cancel()
+            self._hot_refresh_task = None
         if self.redis:
             await self.redis.close()
             print("✓ Redis connection closed")
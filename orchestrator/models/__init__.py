@@ -16,6 +16,7 @@ from models.events import (
     EventType,
     GoalReceived,
     PlanGenerated,
+    ToolCallCompleted,
     ToolCallRequested,
     ToolResultReceived,
     TraceContext,
@@ -31,6 +32,7 @@ __all__ = [
     "EventType",
     "GoalReceived",
     "PlanGenerated",
+    "ToolCallCompleted",
     "ToolCallRequested",
     "ToolResultReceived",
     "TraceContext",
@@ -47,6 +47,7 @@ class EventType(str, Enum):
     ORCHESTRATOR_PLAN_GENERATED = "orchestrator:agent.plan_generated"
     ORCHESTRATOR_TOOL_CALL_REQUESTED = "orchestrator:agent.tool_call_requested"
     ORCHESTRATOR_TOOL_RESULT_RECEIVED = "orchestrator:agent.tool_result_received"
+    ORCHESTRATOR_TOOL_CALL_COMPLETED = "orchestrator:agent.tool_call_completed"
     ORCHESTRATOR_WORKFLOW_COMPLETED = "orchestrator:workflow.completed"
     ORCHESTRATOR_WORKFLOW_FAILED = "orchestrator:workflow.failed"
 
@@ -188,8 +189,14 @@ class AgentEvent(BaseModel):
     - Deterministic replay for Temporal.io workflows
     - Time-travel debugging (replay to any point)
     - Easy to add new event types without breaking existing workflows
+
+    Memory: pydantic stores field values in the instance __dict__, so dataclass-style
+    slots don't apply. Subclasses declare empty __slots__ so each event instance does
+    not also carry a __weakref__ slot (events are frozen and never weakly referenced).
     """
 
+    __slots__ = ()
+
     event_id: str = Field(default_factory=lambda: str(uuid4()))
     timestamp: str = Field(default_factory=lambda: datetime.utcnow().isoformat() + "Z")
     correlation_id: str = Field(..., description="Links all events in a workflow instance")
@@ -204,6 +211,8 @@ class GoalReceived(AgentEvent):
     Example: "Book a flight to Paris tomorrow and reserve a hotel near the Eiffel Tower"
     """
 
+    __slots__ = ()
+
     goal: str = Field(..., description="User's goal in natural language")
     user_id: str = Field(..., description="User ID who submitted the goal")
     context: Optional[dict[str, Any]] = Field(
@@ -220,11 +229,17 @@ class PlanGenerated(AgentEvent):
     2. Fresh LLM generation
     """
 
+    __slots__ = ()
+
     plan_id: str = Field(..., description="Unique plan identifier")
     steps: list[dict[str, Any]] = Field(..., description="Execution steps (DAG nodes)")
     cache_hit: bool = Field(..., description="True if plan came from semantic cache")
     template_id: Optional[str] = Field(None, description="Plan template ID (if cache hit)")
     estimated_duration_seconds: Optional[int] = Field(None, description="Estimated execution time")
+    explicit_dependencies: bool = Field(
+        default=False,
+        description="Every step declares its depends_on (plan may run as concurrent waves)",
+    )
 
 
 class ToolCallRequested(AgentEvent):
@@ -235,6 +250,8 @@ class ToolCallRequested(AgentEvent):
     with automatic retries and timeout enforcement.
     """
 
+    __slots__ = ()
+
     tool_name: str = Field(..., description="Tool to execute")
     tool_input: dict[str, Any] = Field(..., description="Tool input parameters (validated)")
     step_id: str = Field(..., description="Step ID from plan")
@@ -248,16 +265,51 @@ class ToolResultReceived(AgentEvent):
     Tool execution completed (activity result).
 
     Contains either success result or error details for retry/compensation logic.
+
+    Prefer result_digest + result_size + result_preview over the full `result`
+    (tool outputs can be KBs) to keep history small. AgentWorkflow records the
+    fused ToolCallCompleted event instead.
     """
 
+    __slots__ = ()
+
     tool_name: str = Field(..., description="Tool that was executed")
     step_id: str = Field(..., description="Step ID from plan")
     success: bool = Field(..., description="True if tool execution succeeded")
     result: Optional[dict[str, Any]] = Field(None, description="Tool output (if success)")
+    result_digest: Optional[str] = Field(None, description="SHA256 of JSON-encoded tool output")
+    result_size: Optional[int] = Field(None, description="Size of JSON-encoded output in bytes")
+    result_preview: Optional[str] = Field(None, description="Leading chars of JSON output")
     error: Optional[str] = Field(None, description="Error message (if failure)")
     retry_count: int = Field(default=0, description="Number of retries attempted")
 
 
+class ToolCallCompleted(AgentEvent):
+    """
+    Tool execution settled - fused ToolCallRequested + ToolResultReceived.
+
+    Recorded once per step after the activity returns (or fails after retries),
+    halving per-step event count. Carries a result digest rather than the full output.
+    """
+
+    __slots__ = ()
+
+    tool_name: str = Field(..., description="Tool that was executed")
+    tool_input: dict[str, Any] = Field(..., description="Tool input parameters")
+    step_id: str = Field(..., description="Step ID from plan")
+    compensation_activity: Optional[str] = Field(
+        None, description="Compensation activity name (for Saga pattern)"
+    )
+    success: bool = Field(..., description="True if tool execution succeeded")
+    result_digest: Optional[str] = Field(None, description="SHA256 of JSON-encoded tool output")
+    result_size: Optional[int] = Field(None, description="Size of JSON-encoded output in bytes")
+    result_preview: Optional[str] = Field(None, description="Leading chars of JSON output")
+    error: Optional[str] = Field(None, description="Error message (if failure)")
+    started_at: str = Field(..., description="ISO 8601 time the tool call started")
+    ended_at: str = Field(..., description="ISO 8601 time the tool call settled")
+    duration_ms: int = Field(..., description="Tool call duration in milliseconds")
+
+
 class WorkflowCompleted(AgentEvent):
     """
     Workflow completed successfully (all steps executed).
@@ -265,6 +317,8 @@ class WorkflowCompleted(AgentEvent):
     This is the terminal success state.
     """
 
+    __slots__ = ()
+
     plan_id: str = Field(..., description="Completed plan ID")
     total_steps: int = Field(..., description="Total number of steps executed")
     duration_seconds: float = Field(..., description="Total workflow duration")
@@ -278,6 +332,8 @@ class WorkflowFailed(AgentEvent):
     Includes compensation details if Saga rollback was triggered.
     """
 
+    __slots__ = ()
+
     plan_id: str = Field(..., description="Failed plan ID")
     failed_step_id: str = Field(..., description="Step that caused failure")
     error_message: str = Field(..., description="Error details")
@@ -10,6 +10,7 @@ from models.events import (
     GoalReceived,
     PlanGenerated,
     SchemaTranslator,
+    ToolCallCompleted,
     ToolCallRequested,
     ToolResultReceived,
     TraceContext,
@@ -124,6 +125,42 @@ class TestAgentEvents:
         assert event.result == {"data": [{"id": 1}]}
         assert event.error is None
 
+    def test_tool_result_digest(self):
+        """Should record a result digest instead of the full payload."""
+        event = ToolResultReceived(
+            correlation_id="corr-123",
+            tool_name="search_database",
+            step_id="step1",
+            success=True,
+            result_digest="ab" * 32,
+            result_size=2048,
+            result_preview='{"data": [',
+        )
+
+        assert event.result is None
+        assert event.result_size == 2048
+        assert len(event.result_digest) == 64
+
+    def test_tool_call_completed_event(self):
+        """Should record a settled tool call in a single event."""
+        event = ToolCallCompleted(
+            correlation_id="corr-123",
+            tool_name="book_flight",
+            tool_input={"to": "Paris"},
+            step_id="step1",
+            compensation_activity="cancel_flight",
+            success=True,
+            result_digest="ab" * 32,
+            result_size=128,
+            started_at="2026-01-01T00:00:00Z",
+            ended_at="2026-01-01T00:00:01.250000Z",
+            duration_ms=1250,
+        )
+
+        assert event.success is True
+        assert event.duration_ms == 1250
+        assert event.error is None
+
     def test_tool_result_failure(self):
         """Should record failed tool execution."""
         event = ToolResultReceived(
@@ -168,6 +205,46 @@ class TestAgentEvents:
         assert len(event.compensation_results) == 1
 
 
+class TestAgentEventLayout:
+    """Test agent events stay compact and immutable."""
+
+    @pytest.mark.parametrize(
+        "event",
+        [
+            GoalReceived(correlation_id="c", goal="g", user_id="u"),
+            PlanGenerated(correlation_id="c", plan_id="p", steps=[], cache_hit=False),
+            ToolCallRequested(correlation_id="c", tool_name="t", tool_input={}, step_id="s"),
+            ToolResultReceived(correlation_id="c", tool_name="t", step_id="s", success=True),
+            ToolCallCompleted(
+                correlation_id="c",
+                tool_name="t",
+                tool_input={},
+                step_id="s",
+                success=False,
+                started_at="2026-01-01T00:00:00Z",
+                ended_at="2026-01-01T00:00:00Z",
+                duration_ms=0,
+            ),
+            WorkflowCompleted(
+                correlation_id="c", plan_id="p", total_steps=0, duration_seconds=0, final_result={}
+            ),
+            WorkflowFailed(
+                correlation_id="c",
+                plan_id="p",
+                failed_step_id="s",
+                error_message="e",
+                compensation_executed=False,
+            ),
+        ],
+    )
+    def test_no_weakref_slot_and_frozen(self, event):
+        """Events should not carry a __weakref__ slot and should reject mutation."""
+        assert not hasattr(event, "__weakref__")
+
+        with pytest.raises(ValidationError):
+            event.correlation_id = "other"
+
+
 class TestSchemaTranslator:
     """Test dynamic schema translation."""
 
@@ -0,0 +1,702 @@
+"""Unit tests for AgentWorkflow derived state and SagaContext helpers."""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from temporalio.exceptions import ActivityError, ApplicationError, RetryState
+
+from models.events import GoalReceived, PlanGenerated, ToolCallCompleted, ToolCallRequested
+from workflows import agent_saga
+from workflows.agent_saga import (
+    AgentWorkflow,
+    CompensationStep,
+    SagaContext,
+    _plan_waves,
+    _summarize_result,
+)
+
+
+@pytest.fixture
+def workflow_logger(monkeypatch):
+    """Route workflow.logger to a plain logger (no workflow event loop in unit tests)."""
+    monkeypatch.setattr(agent_saga.workflow, "logger", logging.getLogger("test.workflow"))
+
+
+@pytest.fixture(autouse=True)
+def workflow_patches(monkeypatch):
+    """
+    Stub workflow.patched(): every patch applies, like a new execution.
+
+    Add patch IDs to the returned set to replay as an execution started before them.
+    """
+    unpatched: set[str] = set()
+    monkeypatch.setattr(agent_saga.workflow, "patched", lambda patch_id: patch_id not in unpatched)
+    return unpatched
+
+
+@pytest.fixture
+def workflow_clock(monkeypatch):
+    """Stub workflow.now() with a clock that advances 5ms per call."""
+    ticks = iter(range(10_000))
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    monkeypatch.setattr(
+        agent_saga.workflow, "now", lambda: start + timedelta(milliseconds=5 * next(ticks))
+    )
+
+
+def activity_error(message: str) -> ActivityError:
+    """Build an ActivityError as Temporal raises after retries are exhausted."""
+    return ActivityError(
+        message,
+        scheduled_event_id=1,
+        started_event_id=2,
+        identity="test",
+        activity_type="test",
+        activity_id="1",
+        retry_state=RetryState.MAXIMUM_ATTEMPTS_REACHED,
+    )
+
+
+def make_workflow(steps=None, explicit_dependencies=True) -> AgentWorkflow:
+    """Create a workflow with a saga context and plan, as run() would."""
+    wf = AgentWorkflow()
+    wf.saga = SagaContext(workflow_instance=wf)
+    wf._correlation_id = "wf-1"
+    wf.goal = "Book flight"
+    wf.user_id = "user-1"
+    wf.plan_id = "plan-1"
+    wf.plan_steps = steps or []
+    wf._explicit_dependencies = explicit_dependencies
+    return wf
+
+
+@pytest.mark.asyncio
+class TestEventSourcing:
+    """Test event dispatch and derived-state updates."""
+
+    async def test_goal_and_plan_update_derived_state(self):
+        """Should derive goal and plan state from events."""
+        wf = AgentWorkflow()
+
+        wf._queue_event(GoalReceived(correlation_id="wf-1", goal="Book flight", user_id="user-1"))
+        wf._queue_event(
+            PlanGenerated(
+                correlation_id="wf-1",
+                plan_id="plan-1",
+                steps=[{"id": "s1", "tool": "search"}],
+                cache_hit=False,
+            )
+        )
+        assert wf.plan_id == ""  # Buffered until the next flush
+
+        await wf._flush_events()
+
+        assert wf.goal == "Book flight"
+        assert wf.user_id == "user-1"
+        assert wf.plan_id == "plan-1"
+        assert wf.plan_steps == [{"id": "s1", "tool": "search"}]
+
+    async def test_unhandled_events_only_counted(self):
+        """Events without a reducer should be counted but not change derived state."""
+        wf = AgentWorkflow()
+
+        wf._queue_event(
+            ToolCallRequested(
+                correlation_id="wf-1", tool_name="search", tool_input={}, step_id="s1"
+            )
+        )
+        await wf._flush_events()
+
+        assert wf._event_count == 1
+        assert wf.plan_id == ""
+
+    async def test_audit_trail_counts_events(self):
+        """Audit query should summarize events without retaining them."""
+        wf = AgentWorkflow()
+
+        wf._queue_event(GoalReceived(correlation_id="wf-1", goal="Book flight", user_id="user-1"))
+        for idx in range(3):
+            wf._queue_event(
+                ToolCallRequested(
+                    correlation_id="wf-1", tool_name="search", tool_input={}, step_id=f"s{idx}"
+                )
+            )
+        await wf._flush_events()
+
+        audit = wf.get_audit_trail()
+        assert audit["event_count"] == 4
+        assert audit["event_counts"] == {"GoalReceived": 1, "ToolCallRequested": 3}
+        assert not hasattr(wf, "events")
+
+
+class TestCompensationPlaceholders:
+    """Test compile-once / inject-per-step compensation placeholders."""
+
+    def test_compile_placeholders(self):
+        """Should compile {result.field} strings and keep static values."""
+        compiled = SagaContext.compile_compensation_input(
+            {"booking_id": "{result.booking_id}", "reason": "rollback", "note": "{result.}"}
+        )
+
+        assert compiled == {
+            "booking_id": ("__ref__", "booking_id"),
+            "reason": "rollback",
+            "note": "{result.}",
+        }
+
+    def test_compile_rehydrates_json_references(self):
+        """References serialized as lists (continue-as-new) should compile back to tuples."""
+        compiled = SagaContext.compile_compensation_input({"booking_id": ["__ref__", "booking_id"]})
+
+        assert compiled == {"booking_id": ("__ref__", "booking_id")}
+
+    def test_inject_result_values(self):
+        """Should resolve compiled references; unresolved ones keep their placeholder."""
+        compiled = SagaContext.compile_compensation_input(
+            {"booking_id": "{result.booking_id}", "seat": "{result.seat}", "reason": "rollback"}
+        )
+
+        injected = SagaContext._inject_result_values(compiled, {"booking_id": "BK123"})
+
+        assert injected == {
+            "booking_id": "BK123",
+            "seat": "{result.seat}",
+            "reason": "rollback",
+        }
+
+    @pytest.mark.asyncio
+    async def test_plan_steps_compiled_on_plan_generated(self):
+        """PlanGenerated should compile placeholders without mutating the event."""
+        wf = AgentWorkflow()
+        steps = [{"id": "s1", "tool": "book", "compensation_input": {"id": "{result.booking_id}"}}]
+        event = PlanGenerated(correlation_id="wf-1", plan_id="p1", steps=steps, cache_hit=False)
+
+        wf._queue_event(event)
+        await wf._flush_events()
+
+        assert wf.plan_steps[0]["compensation_input"] == {"id": ("__ref__", "booking_id")}
+        assert event.steps[0]["compensation_input"] == {"id": "{result.booking_id}"}
+        assert wf.plan_steps[0]["_needs_injection"] is True
+        assert wf._explicit_dependencies is False  # Not stamped by the planner
+
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures("workflow_logger")
+    async def test_static_compensation_input_skips_injection(self, monkeypatch):
+        """Compensation inputs without references should be registered as-is."""
+        wf = make_workflow([])
+
+        async def execute(activity_name, activity_input, step_id, is_compensation=False):
+            return {"booking_id": "BK1"}
+
+        def inject(*args):
+            raise AssertionError("injection should be skipped")
+
+        wf._execute_activity = execute
+        monkeypatch.setattr(SagaContext, "_inject_result_values", staticmethod(inject))
+        static_input = {"reason": "rollback"}
+
+        await wf.saga.execute_with_compensation("book", {}, "cancel", static_input, step_id="s1")
+
+        assert not SagaContext.has_result_refs(static_input)
+        assert wf.saga.compensation_stack[0].input == static_input
+
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures("workflow_logger")
+    async def test_raw_placeholders_injected(self):
+        """Direct SagaContext callers may pass uncompiled {result.field} placeholders."""
+        wf = make_workflow([])
+
+        async def execute(activity_name, activity_input, step_id, is_compensation=False):
+            return {"booking_id": "BK1"}
+
+        wf._execute_activity = execute
+
+        await wf.saga.execute_with_compensation(
+            "book", {}, "cancel", {"booking_id": "{result.booking_id}"}, step_id="s1"
+        )
+
+        assert wf.saga.compensation_stack[0].input == {"booking_id": "BK1"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("workflow_logger")
+class TestSagaRollback:
+    """Test best-effort LIFO compensation."""
+
+    async def test_rollback_lifo_and_drains_stack(self):
+        """Should compensate newest-first, keep going past failures and empty the stack."""
+        executed = []
+
+        async def execute(activity_name, activity_input, step_id, is_compensation=False):
+            executed.append(step_id)
+            if step_id == "s2":
+                raise activity_error("cancel failed")
+            return {"cancelled": step_id, "payload": "x" * 1024}
+
+        saga = SagaContext(workflow_instance=SimpleNamespace(_execute_activity=execute))
+        for step_id in ("s1", "s2", "s3"):
+            saga.compensation_stack.append(
+                CompensationStep(activity_name="cancel", input={}, step_id=step_id)
+            )
+
+        results = await saga.rollback()
+
+        assert executed == ["s3", "s2", "s1"]
+        assert saga.compensation_stack == []
+        assert results[0] == {"step_id": "s3", "success": True}
+        assert results[1]["success"] is False and "error" in results[1]
+        assert await saga.rollback() == []  # Idempotent
+
+    async def test_independent_compensations_run_concurrently(self):
+        """Adjacent independent compensations should run together; dependent ones alone."""
+        running = {"now": 0, "peak": 0}
+        groups = []
+
+        async def execute(activity_name, activity_input, step_id, is_compensation=False):
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            groups.append((step_id, running["now"]))
+            await asyncio.sleep(0)
+            running["now"] -= 1
+            return {}
+
+        saga = SagaContext(workflow_instance=SimpleNamespace(_execute_activity=execute))
+        for step_id, independent in (("s1", False), ("s2", True), ("s3", True), ("s4", True)):
+            saga.compensation_stack.append(
+                CompensationStep(
+                    activity_name="cancel", input={}, step_id=step_id, independent=independent
+                )
+            )
+
+        results = await saga.rollback()
+
+        assert running["peak"] == 3
+        assert [r["step_id"] for r in results] == ["s4", "s3", "s2", "s1"]
+        assert groups[-1] == ("s1", 1)  # Dependent compensation ran alone, last
+
+    async def test_pre_patch_rollback_is_sequential(self, workflow_patches):
+        """Executions recorded before concurrent rollback must compensate one at a time."""
+        running = {"now": 0, "peak": 0}
+
+        async def execute(activity_name, activity_input, step_id, is_compensation=False):
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0)
+            running["now"] -= 1
+            return {}
+
+        workflow_patches.add(agent_saga._PATCH_CONCURRENT_ROLLBACK)
+        saga = SagaContext(workflow_instance=SimpleNamespace(_execute_activity=execute))
+        for step_id in ("s1", "s2"):
+            saga.compensation_stack.append(
+                CompensationStep(
+                    activity_name="cancel", input={}, step_id=step_id, independent=True
+                )
+            )
+
+        results = await saga.rollback()
+
+        assert running["peak"] == 1
+        assert [r["step_id"] for r in results] == ["s2", "s1"]
+
+
+class TestSemanticCacheLookup:
+    """Test goal normalization before the cache activity."""
+
+    def test_normalize_goal(self):
+        """Should lowercase, collapse whitespace and strip trailing punctuation."""
+        assert AgentWorkflow._normalize_goal("What's  France's\tCapital?") == (
+            "what's france's capital"
+        )
+        assert AgentWorkflow._normalize_goal("Book flight!") == "book flight"
+
+    @pytest.mark.asyncio
+    async def test_passes_raw_and_normalized_goal(self, monkeypatch):
+        """The cache activity should receive both goal variants."""
+        captured = {}
+
+        async def execute_local_activity(name, args, **kwargs):
+            captured.update(name=name, args=args)
+            return None
+
+        monkeypatch.setattr(agent_saga.workflow, "execute_local_activity", execute_local_activity)
+
+        assert await AgentWorkflow()._check_semantic_cache("Book  Flight?") is None
+        assert captured == {
+            "name": "check_semantic_cache",
+            "args": ["Book  Flight?", "book flight"],
+        }
+
+    @pytest.mark.asyncio
+    async def test_pre_patch_executions_use_regular_activity(self, monkeypatch, workflow_patches):
+        """Executions recorded before the local-activity switch must replay unchanged."""
+        scheduled = []
+
+        async def execute_activity(name, args, **kwargs):
+            scheduled.append(name)
+            return None
+
+        workflow_patches.add(agent_saga._PATCH_LOCAL_CACHE_LOOKUP)
+        monkeypatch.setattr(agent_saga.workflow, "execute_activity", execute_activity)
+
+        assert await AgentWorkflow()._check_semantic_cache("Book flight") is None
+        assert scheduled == ["check_semantic_cache"]
+
+
+def wave_ids(waves) -> list[list[str]]:
+    """Flatten waves into step IDs for readable assertions."""
+    return [[step["id"] for _, step in wave] for wave in waves]
+
+
+class TestPlanWaves:
+    """Test DAG wavefront scheduling."""
+
+    def test_independent_steps_share_a_wave(self):
+        """Steps without dependencies should run in the first wave."""
+        steps = [
+            {"id": "flight", "tool": "book_flight"},
+            {"id": "hotel", "tool": "book_hotel"},
+            {"id": "email", "tool": "send_email", "depends_on": ["flight", "hotel"]},
+        ]
+
+        assert wave_ids(_plan_waves(steps)) == [["flight", "hotel"], ["email"]]
+
+    def test_chain_runs_in_order(self):
+        """Dependency chains should produce one step per wave."""
+        steps = [
+            {"id": "c", "tool": "t", "depends_on": ["b"]},
+            {"id": "b", "tool": "t", "depends_on": ["a"]},
+            {"id": "a", "tool": "t"},
+        ]
+
+        assert wave_ids(_plan_waves(steps)) == [["a"], ["b"], ["c"]]
+
+    def test_completed_steps_skipped(self):
+        """Steps already completed (resumed run) should not be rescheduled."""
+        steps = [{"id": "a", "tool": "t"}, {"id": "b", "tool": "t", "depends_on": ["a"]}]
+
+        assert wave_ids(_plan_waves(steps, completed={"a"})) == [["b"]]
+
+    def test_cycle_rejected(self):
+        """Cyclic plans should fail instead of hanging."""
+        steps = [
+            {"id": "a", "tool": "t", "depends_on": ["b"]},
+            {"id": "b", "tool": "t", "depends_on": ["a"]},
+        ]
+
+        with pytest.raises(ApplicationError):
+            _plan_waves(steps)
+
+    def test_unknown_dependency_rejected(self):
+        """Dependencies on missing steps should fail fast."""
+        with pytest.raises(ApplicationError):
+            _plan_waves([{"id": "a", "tool": "t", "depends_on": ["ghost"]}])
+
+    def test_repeated_parent_schedules_step_once(self):
+        """Listing a parent twice must not run the child twice."""
+        steps = [{"id": "a", "tool": "t"}, {"id": "c", "tool": "book", "depends_on": ["a", "a"]}]
+
+        assert wave_ids(_plan_waves(steps)) == [["a"], ["c"]]
+
+    @pytest.mark.parametrize(
+        "steps",
+        [
+            [{"id": "a", "tool": "t"}, {"id": "a", "tool": "t"}],
+            [{"tool": "t"}, {"id": "step_0", "tool": "t"}],  # Default ID collides
+        ],
+    )
+    def test_duplicate_ids_rejected(self, steps):
+        """Steps sharing an ID would silently be dropped - fail instead."""
+        with pytest.raises(ApplicationError, match="Duplicate step ID"):
+            _plan_waves(steps)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("workflow_logger", "workflow_clock")
+class TestExecutePlan:
+    """Test plan execution against a stubbed activity executor."""
+
+    @staticmethod
+    def stub_activities(wf, fail=()):
+        """Replace activity execution with an in-process stub that records calls."""
+        calls = []
+        running = {"now": 0, "peak": 0}
+
+        async def execute(activity_name, activity_input, step_id, is_compensation=False):
+            calls.append((activity_name, step_id))
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0)
+            running["now"] -= 1
+            if step_id in fail and not is_compensation:
+                raise activity_error(f"{activity_name} failed")
+            return {"step": step_id}
+
+        wf._execute_activity = execute
+        return calls, running
+
+    async def test_independent_steps_run_concurrently(self):
+        """Steps in the same wave should be in flight at the same time."""
+        wf = make_workflow(
+            [
+                {"id": "flight", "tool": "book_flight"},
+                {"id": "hotel", "tool": "book_hotel"},
+                {"id": "email", "tool": "send_email", "depends_on": ["flight", "hotel"]},
+            ]
+        )
+        calls, running = self.stub_activities(wf)
+
+        await wf._execute_plan()
+
+        assert running["peak"] == 2
+        assert calls[-1] == ("send_email", "email")
+        assert set(wf.step_results) == {"flight", "hotel", "email"}
+
+    async def test_read_only_steps_bypass_saga(self, monkeypatch):
+        """Only steps with a compensation should go through the saga."""
+        wf = make_workflow(
+            [
+                {"id": "search", "tool": "search_flights"},
+                {"id": "book", "tool": "book_flight", "compensation": "cancel_flight"},
+            ]
+        )
+        calls, _ = self.stub_activities(wf)
+        via_saga = []
+        execute_with_compensation = wf.saga.execute_with_compensation
+
+        async def spy(activity_name, *args, **kwargs):
+            via_saga.append(activity_name)
+            return await execute_with_compensation(activity_name, *args, **kwargs)
+
+        monkeypatch.setattr(wf.saga, "execute_with_compensation", spy)
+
+        await wf._execute_plan()
+
+        assert via_saga == ["book_flight"]
+        assert ("search_flights", "search") in calls
+        assert [c.step_id for c in wf.saga.compensation_stack] == ["book"]
+
+    async def test_pre_patch_executions_run_sequentially(self, workflow_patches):
+        """Executions started before wave scheduling must replay steps one at a time."""
+        wf = make_workflow([{"id": "a", "tool": "t"}, {"id": "b", "tool": "t"}])
+        calls, running = self.stub_activities(wf)
+        workflow_patches.add(agent_saga._PATCH_DAG_WAVES)
+
+        await wf._execute_plan()
+
+        assert running["peak"] == 1
+        assert calls == [("t", "a"), ("t", "b")]
+
+    async def test_implicit_dependency_plans_run_sequentially(self):
+        """Plans without explicit dependencies (e.g. old cached templates) keep plan order."""
+        wf = make_workflow(
+            [{"id": "book", "tool": "book_flight"}, {"id": "email", "tool": "send_email"}],
+            explicit_dependencies=False,
+        )
+        calls, running = self.stub_activities(wf)
+
+        await wf._execute_plan()
+
+        assert running["peak"] == 1
+        assert calls == [("book_flight", "book"), ("send_email", "email")]
+
+    async def test_one_fused_event_per_step(self):
+        """Each step should record a single ToolCallCompleted with a digest, not the output."""
+        wf = make_workflow([{"id": "search", "tool": "search_database"}])
+        self.stub_activities(wf)
+        recorded = []
+        queue_event = wf._queue_event
+        wf._queue_event = lambda event: (recorded.append(event), queue_event(event))
+
+        await wf._execute_plan()
+
+        assert len(recorded) == 1
+        event = recorded[0]
+        assert isinstance(event, ToolCallCompleted)
+        assert event.success is True
+        assert event.result_digest == _summarize_result({"step": "search"})[0]
+        assert event.result_size == len('{"step": "search"}')
+        assert event.duration_ms == 5
+        assert event.started_at.endswith("Z")
+        assert wf.step_results["search"] == {"step": "search"}
+        assert wf.get_in_flight_steps() == []
+
+    async def test_continue_as_new_at_wave_boundary(self, monkeypatch):
+        """Crossing the history threshold should checkpoint between waves, not mid-wave."""
+
+        class ContinuedAsNew(BaseException):
+            pass
+
+        def continue_as_new(args):
+            raise ContinuedAsNew(args[2]["resume"])
+
+        monkeypatch.setattr(agent_saga.workflow, "continue_as_new", continue_as_new)
+
+        wf = make_workflow(
+            [
+                {"id": "a", "tool": "t"},
+                {"id": "b", "tool": "t"},
+                {"id": "c", "tool": "t", "depends_on": ["a", "b"]},
+            ]
+        )
+        wf.MAX_HISTORY_SIZE = 2
+        self.stub_activities(wf)
+
+        with pytest.raises(ContinuedAsNew) as exc_info:
+            await wf._execute_plan()
+
+        snapshot = exc_info.value.args[0]
+        assert set(snapshot["step_results"]) == {"a", "b"}
+        assert [step["id"] for step in snapshot["remaining_steps"]] == ["c"]
+
+    async def test_pre_patch_executions_never_continue_as_new(self, monkeypatch, workflow_patches):
+        """Executions started before checkpointing existed must replay without it."""
+
+        def continue_as_new(args):
+            raise AssertionError("pre-patch execution continued-as-new")
+
+        monkeypatch.setattr(agent_saga.workflow, "continue_as_new", continue_as_new)
+        workflow_patches.add(agent_saga._PATCH_CONTINUE_AS_NEW)
+
+        wf = make_workflow(
+            [{"id": "a", "tool": "t"}, {"id": "b", "tool": "t", "depends_on": ["a"]}]
+        )
+        wf.MAX_HISTORY_SIZE = 1
+        self.stub_activities(wf)
+
+        await wf._execute_plan()
+
+        assert set(wf.step_results) == {"a", "b"}
+
+    async def test_non_activity_failure_not_checkpointed(self, monkeypatch):
+        """A malformed step must fail the plan even when the history threshold is crossed."""
+
+        def continue_as_new(args):
+            raise AssertionError("failure was checkpointed away")
+
+        monkeypatch.setattr(agent_saga.workflow, "continue_as_new", continue_as_new)
+
+        wf = make_workflow(
+            [
+                {"id": "a", "tool": "t"},
+                {"id": "broken"},  # No tool
+                {"id": "c", "tool": "t", "depends_on": ["a"]},
+            ]
+        )
+        wf.MAX_HISTORY_SIZE = 1
+        self.stub_activities(wf)
+
+        with pytest.raises(KeyError):
+            await wf._execute_plan()
+
+        assert wf.failed_step_id == "broken"
+
+    async def test_failure_lets_siblings_settle(self):
+        """A failing step should re-raise only after its siblings registered compensations."""
+        wf = make_workflow(
+            [
+                {"id": "flight", "tool": "book_flight", "compensation": "cancel_flight"},
+                {"id": "hotel", "tool": "book_hotel"},
+                {"id": "email", "tool": "send_email", "depends_on": ["flight", "hotel"]},
+            ]
+        )
+        calls, _ = self.stub_activities(wf, fail={"hotel"})
+
+        with pytest.raises(ActivityError):
+            await wf._execute_plan()
+
+        assert wf.failed_step_id == "hotel"
+        assert [c.step_id for c in wf.saga.compensation_stack] == ["flight"]
+        assert ("send_email", "email") not in calls
+
+    async def test_raised_error_matches_failed_step(self):
+        """With several failures in a wave, the raised error belongs to failed_step_id."""
+        wf = make_workflow(
+            [{"id": "slow", "tool": "book_flight"}, {"id": "fast", "tool": "book_hotel"}]
+        )
+
+        async def execute(activity_name, activity_input, step_id, is_compensation=False):
+            if step_id == "slow":
+                for _ in range(3):
+                    await asyncio.sleep(0)
+            raise activity_error(f"{step_id} failed")
+
+        wf._execute_activity = execute
+
+        with pytest.raises(ActivityError, match="fast failed"):
+            await wf._execute_plan()
+
+        assert wf.failed_step_id == "fast"
+
+
+class TestStepResults:
+    """Test the parallel-array step result container."""
+
+    def test_record_and_view(self):
+        """Should expose results as a dict in completion order and overwrite in place."""
+        wf = AgentWorkflow()
+        wf._record_step_result("b", {"n": 1})
+        wf._record_step_result("a", {"n": 2})
+        wf._record_step_result("b", {"n": 3})
+
+        assert wf.step_results == {"b": {"n": 3}, "a": {"n": 2}}
+        assert list(wf.step_results) == ["b", "a"]
+        assert wf._step_ids == ["b", "a"]
+
+
+class TestContinueAsNew:
+    """Test continue-as-new checkpointing."""
+
+    def test_safe_boundary_between_steps(self):
+        """Should only checkpoint mid-plan with no step in flight and no failure."""
+        wf = make_workflow([{"id": "s1", "tool": "search"}, {"id": "s2", "tool": "book"}])
+        wf._record_step_result("s1", {})
+        assert wf._is_safe_checkpoint_boundary()
+
+        wf._in_flight_steps["s2"] = {"tool": "book", "started_at": "2026-01-01T00:00:00Z"}
+        assert not wf._is_safe_checkpoint_boundary()
+
+        wf._in_flight_steps.clear()
+        wf.failed_step_id = "s2"
+        assert not wf._is_safe_checkpoint_boundary()
+
+    def test_no_checkpoint_after_last_step(self):
+        """Nothing left to resume once all steps have run."""
+        wf = make_workflow([{"id": "s1", "tool": "search"}])
+        wf._record_step_result("s1", {})
+
+        assert not wf._is_safe_checkpoint_boundary()
+
+    @pytest.mark.asyncio
+    async def test_snapshot_round_trip(self, monkeypatch, workflow_logger):
+        """Snapshot should carry remaining steps, results and compensations."""
+        captured = {}
+        monkeypatch.setattr(
+            agent_saga.workflow, "continue_as_new", lambda args: captured.update(args=args)
+        )
+
+        wf = make_workflow([{"id": "s1", "tool": "book"}, {"tool": "email"}])
+        wf._record_step_result("s1", {"booking_id": "BK1"})
+        wf.saga.compensation_stack.append(
+            CompensationStep(activity_name="cancel", input={"booking_id": "BK1"}, step_id="s1")
+        )
+
+        await wf._continue_as_new()
+
+        goal, user_id, context = captured["args"]
+        snapshot = context["resume"]
+        assert (goal, user_id) == ("Book flight", "user-1")
+        assert snapshot["remaining_steps"] == [{"tool": "email", "id": "step_1"}]
+
+        resumed = AgentWorkflow()
+        resumed.saga = SagaContext(workflow_instance=resumed)
+        resumed._restore_checkpoint(goal, user_id, snapshot)
+
+        assert resumed.plan_id == "plan-1"
+        assert resumed._explicit_dependencies is True
+        assert resumed.plan_steps == snapshot["remaining_steps"]
+        assert resumed.step_results == {"s1": {"booking_id": "BK1"}}
+        assert resumed.saga.compensation_stack == wf.saga.compensation_stack
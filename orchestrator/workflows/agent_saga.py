@@ -32,8 +32,14 @@ Architecture:
     → [Success: Store Result] OR [Failure: Rollback Saga]
 """
 
-from dataclasses import dataclass, field
-from datetime import timedelta
+import asyncio
+import hashlib
+import json
+import re
+from collections import defaultdict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
 from typing import Any, Optional
 
 from temporalio import workflow
@@ -46,13 +52,116 @@ with workflow.unsafe.imports_passed_through():
         AgentEvent,
         GoalReceived,
         PlanGenerated,
-        ToolCallRequested,
-        ToolResultReceived,
+        ToolCallCompleted,
         WorkflowCompleted,
         WorkflowFailed,
     )
 
 
+# Compensation placeholder "{result.field}" → compiled to (_RESULT_REF, "field") at plan time
+_PLACEHOLDER_RE = re.compile(r"^\{result\.(\w+)\}$")
+_RESULT_REF = "__ref__"
+
+# Leading chars of a tool result kept in ToolCallCompleted (full result stays in step_results)
+_RESULT_PREVIEW_CHARS = 256
+
+# workflow.patched() IDs for changes to the command stream. Executions started before
+# a change replay the old path; remove a branch (deprecate_patch) once those have drained.
+_PATCH_LOCAL_CACHE_LOOKUP = "local-semantic-cache-lookup"
+_PATCH_DAG_WAVES = "dag-wave-scheduling"
+_PATCH_CONTINUE_AS_NEW = "continue-as-new-checkpoint"
+_PATCH_CONCURRENT_ROLLBACK = "concurrent-independent-rollback"
+
+
+def _iso(moment: datetime) -> str:
+    """Format a workflow timestamp as ISO 8601 with Z suffix (matches event timestamps)."""
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+def _summarize_result(result: Any) -> tuple[str, int, str]:
+    """
+    Digest a tool result for the event log: (sha256, size in bytes, preview).
+
+    Keys are sorted so the digest is stable regardless of dict ordering.
+    """
+    payload = json.dumps(result, sort_keys=True, default=str)
+    encoded = payload.encode()
+    return hashlib.sha256(encoded).hexdigest(), len(encoded), payload[:_RESULT_PREVIEW_CHARS]
+
+
+# ============================================================================
+# DAG SCHEDULING
+# ============================================================================
+
+
+def _step_id_for(step: dict[str, Any], idx: int) -> str:
+    """Step ID from the plan, defaulting to its position (step_0, step_1, ...)."""
+    return str(step.get("id", f"step_{idx}"))
+
+
+def _plan_waves(
+    steps: list[dict[str, Any]], completed: Optional[set[str]] = None
+) -> list[list[tuple[int, dict[str, Any]]]]:
+    """
+    Group plan steps into wavefronts using Kahn's algorithm.
+
+    Every step in a wave only depends on steps from earlier waves (or on steps
+    already in `completed`), so a wave can run concurrently. Steps keep plan order
+    within a wave for deterministic event ordering.
+
+    Example:
+        steps = [{"id": "a"}, {"id": "b"}, {"id": "c", "depends_on": ["a", "b"]}]
+        → [[(0, a), (1, b)], [(2, c)]]
+
+    Raises:
+        ApplicationError: If step IDs are not unique, a step depends on an unknown
+            step, or the plan has a cycle
+    """
+    completed = completed or set()
+
+    pending: dict[str, tuple[int, dict[str, Any]]] = {}
+    seen: set[str] = set()
+    for idx, step in enumerate(steps):
+        step_id = _step_id_for(step, idx)
+        if step_id in seen:
+            raise ApplicationError(f"Duplicate step ID {step_id}", non_retryable=True)
+        seen.add(step_id)
+        if step_id not in completed:
+            pending[step_id] = (idx, step)
+
+    deps: dict[str, set[str]] = {}
+    children: dict[str, list[str]] = defaultdict(list)
+    for step_id, (_, step) in pending.items():
+        deps[step_id] = set()
+        for parent in dict.fromkeys(step.get("depends_on") or []):  # Repeats count once
+            if parent in completed:
+                continue
+            if parent not in pending:
+                raise ApplicationError(
+                    f"Step {step_id} depends on unknown step {parent}", non_retryable=True
+                )
+            deps[step_id].add(parent)
+            children[parent].append(step_id)
+
+    waves = []
+    ready = [step_id for step_id in pending if not deps[step_id]]
+    while ready:
+        waves.append([pending[step_id] for step_id in ready])
+        next_ready = []
+        for parent in ready:
+            for child in children[parent]:
+                deps[child].discard(parent)
+                if not deps[child]:
+                    next_ready.append(child)
+        ready = sorted(next_ready, key=lambda step_id: pending[step_id][0])
+
+    scheduled = sum(len(wave) for wave in waves)
+    if scheduled < len(pending):
+        raise ApplicationError("Plan contains a dependency cycle", non_retryable=True)
+
+    return waves
+
+
 # ============================================================================
 # SAGA CONTEXT (Compensation Pattern)
 # ============================================================================
@@ -64,11 +173,16 @@ class CompensationStep:
     A compensation step to execute on rollback.
 
     Stored in LIFO order (stack) - last successful step compensates first.
+
+    `independent` (set by the plan) marks compensations that don't conflict with
+    other rollbacks (e.g. cancel flight vs refund hotel). Adjacent independent
+    compensations run concurrently; the default is the safe sequential order.
     """
 
     activity_name: str
     input: dict[str, Any]
     step_id: str
+    independent: bool = False
 
 
 @dataclass
@@ -84,7 +198,9 @@ class SagaContext:
             activity="book_flight",
             input={"destination": "Paris"},
             compensation_activity="cancel_flight",
-            compensation_input={"booking_id": "{booking_id}"}
+            compensation_input=SagaContext.compile_compensation_input(
+                {"booking_id": "{result.booking_id}"}
+            ),
         )
 
         # On failure, saga automatically rolls back all successful steps
@@ -114,6 +230,8 @@ class SagaContext:
         compensation_activity: Optional[str] = None,
         compensation_input: Optional[dict[str, Any]] = None,
         step_id: str = "",
+        compensation_independent: bool = False,
+        needs_injection: Optional[bool] = None,
     ) -> dict[str, Any]:
         """
         Execute activity and register compensation on success.
@@ -122,8 +240,13 @@ class SagaContext:
             activity_name: Activity to execute
             activity_input: Activity input params
             compensation_activity: Compensation activity name (if any)
-            compensation_input: Compensation input (can use {result.field} placeholders)
+            compensation_input: Compensation input with {result.field} placeholders
+                (raw, or pre-compiled by compile_compensation_input())
             step_id: Step ID for tracking
+            compensation_independent: Compensation may run concurrently with
+                other independent compensations on rollback
+            needs_injection: Whether the pre-compiled compensation_input holds result
+                references (precomputed at plan time). If None, the input is compiled here
 
         Returns:
             Activity result
@@ -138,20 +261,26 @@ class SagaContext:
 
         # Register compensation (only on success)
         if compensation_activity:
-            # Inject result values into compensation input
+            # Inject result values into compensation input (static inputs stored as-is)
             comp_input = compensation_input or {}
-            injected_input = self._inject_result_values(comp_input, result)
+            if needs_injection is None:
+                comp_input = self.compile_compensation_input(comp_input)
+                needs_injection = self.has_result_refs(comp_input)
+            injected_input = (
+                self._inject_result_values(comp_input, result) if needs_injection else comp_input
+            )
 
             compensation = CompensationStep(
                 activity_name=compensation_activity,
                 input=injected_input,
                 step_id=step_id,
+                independent=compensation_independent,
             )
             self.compensation_stack.append(compensation)
 
             stack_size = len(self.compensation_stack)
             workflow.logger.info(
-                f"✓ Registered compensation: {compensation_activity} " f"(stack size={stack_size})"
+                "✓ Registered compensation: %s (stack size=%d)", compensation_activity, stack_size
             )
 
         return result
@@ -160,8 +289,16 @@ class SagaContext:
         """
         Execute all compensations in reverse order (LIFO).
 
+        Runs of adjacent independent compensations are popped as one group and executed
+        concurrently; a dependent compensation runs alone, so LIFO order still holds
+        across it. Rollback wall-clock becomes the critical path, not the sum.
+
+        The stack is drained with pop() so each compensation's input is released as soon
+        as it has run, instead of holding the whole stack until rollback ends.
+
         Returns:
-            List of compensation results (for audit trail)
+            Compensation outcomes for the audit trail: {"step_id", "success"} plus
+            "error" on failure (activity results are omitted to keep WorkflowFailed small)
 
         Note: Compensations are best-effort. Failures are logged but don't block rollback.
         """
@@ -176,53 +313,98 @@ class SagaContext:
             return []
 
         workflow.logger.warning(
-            f"🔄 Starting Saga rollback ({len(self.compensation_stack)} compensations)"
+            "🔄 Starting Saga rollback (%d compensations)", len(self.compensation_stack)
         )
 
         results = []
-        # Execute in reverse order (LIFO)
-        for compensation in reversed(self.compensation_stack):
-            try:
-                result = await self.workflow_instance._execute_activity(
-                    compensation.activity_name,
-                    compensation.input,
-                    compensation.step_id,
-                    is_compensation=True,
-                )
-                results.append({"step_id": compensation.step_id, "success": True, "result": result})
-                workflow.logger.info(f"✓ Compensation succeeded: {compensation.activity_name}")
+        # Execute in reverse order (LIFO), independent neighbours concurrently
+        # (executions recorded before concurrent rollback replay strictly one by one)
+        concurrent = workflow.patched(_PATCH_CONCURRENT_ROLLBACK)
+        while self.compensation_stack:
+            group = [self.compensation_stack.pop()]
+            if concurrent and group[0].independent:
+                while self.compensation_stack and self.compensation_stack[-1].independent:
+                    group.append(self.compensation_stack.pop())
+
+            results.extend(await asyncio.gather(*(self._compensate(c) for c in group)))
+
+        workflow.logger.info("✓ Saga rollback complete (%d compensations executed)", len(results))
+        return results
 
-            except Exception as e:
-                # Log but continue (best-effort rollback)
-                workflow.logger.error(
-                    f"✗ Compensation failed: {compensation.activity_name} - {str(e)}"
-                )
-                results.append({"step_id": compensation.step_id, "success": False, "error": str(e)})
+    async def _compensate(self, compensation: CompensationStep) -> dict[str, Any]:
+        """Execute one compensation; failures are logged and returned, never raised."""
+        try:
+            await self.workflow_instance._execute_activity(
+                compensation.activity_name,
+                compensation.input,
+                compensation.step_id,
+                is_compensation=True,
+            )
+            workflow.logger.info("✓ Compensation succeeded: %s", compensation.activity_name)
+            return {"step_id": compensation.step_id, "success": True}
 
-        workflow.logger.info(f"✓ Saga rollback complete ({len(results)} compensations executed)")
-        return results
+        except Exception as e:
+            # Log but continue (best-effort rollback)
+            workflow.logger.error("✗ Compensation failed: %s - %s", compensation.activity_name, e)
+            return {"step_id": compensation.step_id, "success": False, "error": str(e)}
+
+    @staticmethod
+    def compile_compensation_input(
+        compensation_input: Optional[dict[str, Any]],
+    ) -> dict[str, Any]:
+        """
+        Pre-compile {result.field} placeholders into (_RESULT_REF, field) references.
+
+        Runs once per step at plan time, so registering a compensation in the hot
+        execution loop is a tuple-head check instead of string parsing. Idempotent,
+        and re-hydrates references that went through JSON (continue-as-new) as lists.
+
+        Example:
+            {"booking_id": "{result.booking_id}", "reason": "rollback"}
+            → {"booking_id": ("__ref__", "booking_id"), "reason": "rollback"}
+        """
+        compiled = {}
+        for key, value in (compensation_input or {}).items():
+            if isinstance(value, str):
+                match = _PLACEHOLDER_RE.match(value)
+                if match:
+                    value = (_RESULT_REF, match.group(1))
+            elif isinstance(value, (list, tuple)) and len(value) == 2 and value[0] == _RESULT_REF:
+                value = (_RESULT_REF, value[1])
+            compiled[key] = value
+        return compiled
+
+    @staticmethod
+    def has_result_refs(compensation_input: Optional[dict[str, Any]]) -> bool:
+        """True if compiled compensation input contains any (_RESULT_REF, field) reference."""
+        return any(
+            isinstance(value, tuple) and value and value[0] == _RESULT_REF
+            for value in (compensation_input or {}).values()
+        )
 
     @staticmethod
     def _inject_result_values(
         compensation_input: dict[str, Any], result: dict[str, Any]
     ) -> dict[str, Any]:
         """
-        Inject values from activity result into compensation input.
+        Inject values from activity result into compiled compensation input.
+
+        Unresolved references (field missing from result) fall back to the original
+        {result.field} placeholder string.
 
         Example:
             result = {"booking_id": "BK123", "price": 500}
-            comp_input = {"booking_id": "{result.booking_id}"}
+            comp_input = {"booking_id": ("__ref__", "booking_id")}
             → {"booking_id": "BK123"}
         """
-        injected = {}
-        for key, value in compensation_input.items():
-            if isinstance(value, str) and value.startswith("{result."):
-                # Extract field name: "{result.booking_id}" → "booking_id"
-                field_name = value.replace("{result.", "").replace("}", "")
-                injected[key] = result.get(field_name, value)
-            else:
-                injected[key] = value
-        return injected
+        return {
+            key: (
+                result.get(value[1], f"{{result.{value[1]}}}")
+                if isinstance(value, tuple) and value and value[0] == _RESULT_REF
+                else value
+            )
+            for key, value in compensation_input.items()
+        }
 
 
 # ============================================================================
@@ -259,25 +441,72 @@ class AgentWorkflow:
     - Temporal limits workflow history to ~50K events
     - For long-running workflows, we snapshot state and start fresh
     - Think: Git history squashing or log compaction
-    - Triggered when event list exceeds MAX_HISTORY_SIZE
+    - Triggered when event count exceeds MAX_HISTORY_SIZE
     """
 
+    # Activity options - built once at class scope, not per call (and per replay)
+    _CACHE_TIMEOUT = timedelta(seconds=5)
+    _CACHE_RETRY_POLICY = RetryPolicy(maximum_attempts=2)
+    _PLANNER_TIMEOUT = timedelta(seconds=30)
+    _PLANNER_RETRY_POLICY = RetryPolicy(
+        maximum_attempts=3,
+        initial_interval=timedelta(seconds=1),
+        backoff_coefficient=2.0,
+    )
+    _ACTIVITY_TIMEOUT = timedelta(seconds=30)
+    _COMPENSATION_TIMEOUT = timedelta(seconds=15)  # Shorter timeout for compensations
+    _ACTIVITY_RETRY_POLICY = RetryPolicy(
+        maximum_attempts=3,
+        initial_interval=timedelta(seconds=1),
+        backoff_coefficient=2.0,
+        maximum_interval=timedelta(seconds=10),
+    )
+    _COMPENSATION_RETRY_POLICY = RetryPolicy(
+        maximum_attempts=2,
+        initial_interval=timedelta(seconds=1),
+        backoff_coefficient=2.0,
+        maximum_interval=timedelta(seconds=10),
+    )
+
     def __init__(self) -> None:
         """Initialize workflow state."""
-        # Event sourcing: State reconstructed from events
-        self.events: list[AgentEvent] = []
+        # Event sourcing: State reconstructed from events.
+        # Events are folded into derived state and counters, not retained - the audit
+        # trail is already persisted in Temporal history (see get_audit_trail()).
+        self._event_count: int = 0
+        self._event_counts: dict[str, int] = {}
+        self._event_buffer: list[AgentEvent] = []
+
+        # Derived-state reducers keyed by exact event type (O(1) dispatch per event)
+        self._event_handlers: dict[type[AgentEvent], Callable[[Any], None]] = {
+            GoalReceived: self._apply_goal,
+            PlanGenerated: self._apply_plan,
+        }
 
         # Saga context for compensations
         self.saga: Optional[SagaContext] = None
 
+        # Workflow ID (set once in run())
+        self._correlation_id: str = ""
+
         # Derived state (computed from events)
         self.goal: str = ""
         self.user_id: str = ""
         self.plan_id: str = ""
         self.plan_steps: list[dict[str, Any]] = []
-        self.step_results: dict[str, Any] = {}
+        # Only plans whose steps all declare depends_on run as concurrent waves - older
+        # cached templates and hand-built plans may leave ordering implicit
+        self._explicit_dependencies: bool = False
+        # Step results as parallel arrays + index: step IDs stay dense and hot
+        # for membership/count checks, independent of bulky result payloads
+        self._step_ids: list[str] = []
+        self._step_result_vals: list[Any] = []
+        self._step_index: dict[str, int] = {}
         self.failed_step_id: str = ""
 
+        # Execution progress (used to pick safe continue-as-new checkpoints)
+        self._in_flight_steps: dict[str, dict[str, str]] = {}
+
         # Continue-as-new threshold
         self.MAX_HISTORY_SIZE = 1000
 
@@ -291,7 +520,8 @@ class AgentWorkflow:
         Args:
             goal: User's natural language goal
             user_id: User ID
-            context: Additional context (preferences, history, etc.)
+            context: Additional context (preferences, history, etc.).
+                Contains {"resume": snapshot} when started via continue-as-new.
 
         Returns:
             Workflow result with plan execution details
@@ -299,49 +529,19 @@ class AgentWorkflow:
         Raises:
             ApplicationError: If workflow fails after exhausting retries
         """
-        correlation_id = workflow.info().workflow_id
+        # workflow_id is immutable across replays - read it once, not per event
+        self._correlation_id = workflow.info().workflow_id
 
         # Initialize Saga context
         self.saga = SagaContext(workflow_instance=self)
 
         try:
-            # 1. Record goal received
-            await self._append_event(
-                GoalReceived(
-                    correlation_id=correlation_id,
-                    goal=goal,
-                    user_id=user_id,
-                    context=context,
-                )
-            )
-
-            # 2. Try semantic cache lookup
-            cached_plan = await self._check_semantic_cache(goal)
-
-            # 3. Generate plan (use cache or call LLM)
-            if cached_plan:
-                template_id = cached_plan["template_id"]
-                workflow.logger.info(f"✓ Cache HIT - using cached plan: {template_id}")
-                await self._append_event(
-                    PlanGenerated(
-                        correlation_id=correlation_id,
-                        plan_id=cached_plan["plan_id"],
-                        steps=cached_plan["steps"],
-                        cache_hit=True,
-                        template_id=cached_plan.get("template_id"),
-                    )
-                )
+            snapshot = (context or {}).get("resume")
+            if snapshot:
+                # Continued-as-new: goal, cache lookup and planning already happened
+                self._restore_checkpoint(goal, user_id, snapshot)
             else:
-                workflow.logger.info("✗ Cache MISS - generating fresh plan via LLM")
-                plan = await self._generate_plan_with_llm(goal, context or {})
-                await self._append_event(
-                    PlanGenerated(
-                        correlation_id=correlation_id,
-                        plan_id=plan["plan_id"],
-                        steps=plan["steps"],
-                        cache_hit=False,
-                    )
-                )
+                await self._plan(goal, user_id, context)
 
             # 4. Execute plan steps (DAG traversal)
             await self._execute_plan()
@@ -353,7 +553,7 @@ class AgentWorkflow:
 
         except Exception as e:
             # 6. Workflow failed - trigger Saga rollback
-            workflow.logger.error(f"✗ Workflow failed: {str(e)}")
+            workflow.logger.error("✗ Workflow failed: %s", e)
             workflow_result = await self._handle_failure(str(e))
 
             raise ApplicationError(
@@ -362,24 +562,136 @@ class AgentWorkflow:
                 details=workflow_result,
             ) from e
 
+    async def _plan(
+        self,
+        goal: str,
+        user_id: str,
+        context: Optional[dict[str, Any]],
+    ) -> None:
+        """Record the goal and produce a plan (semantic cache hit or fresh LLM plan)."""
+        # 1. Record goal received
+        self._queue_event(
+            GoalReceived(
+                correlation_id=self._correlation_id,
+                goal=goal,
+                user_id=user_id,
+                context=context,
+            )
+        )
+
+        # 2. Try semantic cache lookup
+        cached_plan = await self._check_semantic_cache(goal)
+
+        # 3. Generate plan (use cache or call LLM)
+        if cached_plan:
+            template_id = cached_plan["template_id"]
+            workflow.logger.info("✓ Cache HIT - using cached plan: %s", template_id)
+            self._queue_event(
+                PlanGenerated(
+                    correlation_id=self._correlation_id,
+                    plan_id=cached_plan["plan_id"],
+                    steps=cached_plan["steps"],
+                    cache_hit=True,
+                    template_id=cached_plan.get("template_id"),
+                    explicit_dependencies=cached_plan.get("explicit_dependencies", False),
+                )
+            )
+        else:
+            workflow.logger.info("✗ Cache MISS - generating fresh plan via LLM")
+            plan = await self._generate_plan_with_llm(goal, context or {})
+            self._queue_event(
+                PlanGenerated(
+                    correlation_id=self._correlation_id,
+                    plan_id=plan["plan_id"],
+                    steps=plan["steps"],
+                    cache_hit=False,
+                    explicit_dependencies=plan.get("explicit_dependencies", False),
+                )
+            )
+
+    @property
+    def step_results(self) -> dict[str, Any]:
+        """Step results keyed by step ID (built on demand from the parallel arrays)."""
+        return dict(zip(self._step_ids, self._step_result_vals, strict=True))
+
+    def _record_step_result(self, step_id: str, result: Any) -> None:
+        """Store a step result (overwrites in place if the step ID was already recorded)."""
+        pos = self._step_index.get(step_id)
+        if pos is None:
+            self._step_index[step_id] = len(self._step_ids)
+            self._step_ids.append(step_id)
+            self._step_result_vals.append(result)
+        else:
+            self._step_result_vals[pos] = result
+
+    @workflow.query(name="get_audit_trail")
+    def get_audit_trail(self) -> dict[str, Any]:
+        """
+        Lightweight audit summary derived from workflow state.
+
+        The full event trail lives in Temporal history - fetch it with
+        client.get_workflow_handle(workflow_id).fetch_history().
+        """
+        return {
+            "event_count": self._event_count,
+            "event_counts": dict(self._event_counts),
+            "plan_id": self.plan_id,
+            "steps_completed": len(self._step_ids),
+            "failed_step_id": self.failed_step_id,
+        }
+
+    @workflow.query(name="get_in_flight_steps")
+    def get_in_flight_steps(self) -> list[dict[str, str]]:
+        """Steps currently executing (step_id, tool, started_at)."""
+        return [{"step_id": step_id, **info} for step_id, info in self._in_flight_steps.items()]
+
     async def _check_semantic_cache(self, goal: str) -> Optional[dict[str, Any]]:
         """
         Check semantic cache for existing plan template.
 
         This is an Activity (not direct Redis call) to maintain determinism.
+
+        Runs as a local activity: the lookup is a short in-process Redis call, so
+        full scheduling (3 history events + a task-queue roundtrip) would dominate it.
+        Local activities record a single marker event instead. Only suitable for
+        low-latency, cheap-to-retry activities - plan generation stays a regular activity.
+
+        The goal is normalized here (pure string ops - replay-safe) so trivially different
+        phrasings share the cache's exact-match tier.
+
+        Executions recorded before the switch replay the regular-activity path.
         """
+        await self._flush_events()
+        lookup = (
+            workflow.execute_local_activity
+            if workflow.patched(_PATCH_LOCAL_CACHE_LOOKUP)
+            else workflow.execute_activity
+        )
         try:
-            result = await workflow.execute_activity(
+            result = await lookup(
                 "check_semantic_cache",
-                args=[goal],
-                start_to_close_timeout=timedelta(seconds=10),
-                retry_policy=RetryPolicy(maximum_attempts=2),
+                args=[goal, self._normalize_goal(goal)],
+                start_to_close_timeout=self._CACHE_TIMEOUT,
+                retry_policy=self._CACHE_RETRY_POLICY,
             )
             return result if result else None
         except ActivityError:
             workflow.logger.warning("Semantic cache lookup failed - proceeding without cache")
             return None
 
+    @staticmethod
+    def _normalize_goal(goal: str) -> str:
+        """
+        Normalize goal text for cache lookup: lowercase, collapse whitespace, strip ?.!
+
+        Mirrors SemanticCacheService.normalize_goal, which the workflow can't import
+        (heavy cache deps); test_workflow_normalization_matches keeps them in sync.
+
+        Example:
+            "What's  France's capital?" → "what's france's capital"
+        """
+        return " ".join(goal.lower().split()).rstrip("?.!")
+
     async def _generate_plan_with_llm(self, goal: str, context: dict[str, Any]) -> dict[str, Any]:
         """
         Generate execution plan using LLM.
@@ -391,15 +703,12 @@ class AgentWorkflow:
 
         The activity also stores the plan in semantic cache for future hits.
         """
+        await self._flush_events()
         result = await workflow.execute_activity(
             "generate_plan_with_llm",
             args=[goal, context],
-            start_to_close_timeout=timedelta(seconds=30),
-            retry_policy=RetryPolicy(
-                maximum_attempts=3,
-                initial_interval=timedelta(seconds=1),
-                backoff_coefficient=2.0,
-            ),
+            start_to_close_timeout=self._PLANNER_TIMEOUT,
+            retry_policy=self._PLANNER_RETRY_POLICY,
         )
         return result
 
@@ -407,66 +716,130 @@ class AgentWorkflow:
         """
         Execute plan steps in dependency order (DAG traversal).
 
-        For simplicity, this implementation executes sequentially.
-        Production version should:
-        - Build dependency graph from step.depends_on
-        - Execute independent steps in parallel
-        - Handle conditional branches
-        """
-        for idx, step in enumerate(self.plan_steps):
-            step_id = step.get("id", f"step_{idx}")
+        Steps are grouped into wavefronts from step.depends_on; each wave runs
+        concurrently, so wall-clock is O(depth × slowest step) instead of the sum
+        of all step latencies. Steps already in step_results (resumed run) are skipped.
+        Plans without explicit_dependencies (pre-DAG cached templates, hand-built plans)
+        run one step at a time in plan order.
 
-            step_name = step.get("name", step_id)
-            workflow.logger.info(f"▶ Executing step {idx + 1}/{len(self.plan_steps)}: {step_name}")
+        If any step in a wave fails, its siblings still settle (so their compensations
+        are registered) before the error of failed_step_id is re-raised to trigger rollback.
 
-            # Record tool call request
-            await self._append_event(
-                ToolCallRequested(
-                    correlation_id=workflow.info().workflow_id,
-                    tool_name=step["tool"],
-                    tool_input=step.get("input", {}),
-                    step_id=step_id,
-                    compensation_activity=step.get("compensation"),
-                )
+        Determinism: gather is pure workflow-level orchestration - Temporal's event
+        loop resolves activity completions in history order on replay. Executions
+        started before wave scheduling replay the original sequential order.
+        """
+        await self._flush_events()  # Apply PlanGenerated before reading plan_steps
+
+        if not workflow.patched(_PATCH_DAG_WAVES) or not self._explicit_dependencies:
+            # Plan order is the only safe order when dependencies may be implicit
+            for idx, step in enumerate(self.plan_steps):
+                await self._execute_step(idx, step)
+                await self._flush_events()  # Step boundary: safe continue-as-new checkpoint
+            return
+
+        for wave in _plan_waves(self.plan_steps, completed=set(self._step_index)):
+            outcomes = await asyncio.gather(
+                *(self._execute_step(idx, step) for idx, step in wave),
+                return_exceptions=True,
             )
+            failures = {
+                _step_id_for(step, idx): outcome
+                for (idx, step), outcome in zip(wave, outcomes, strict=True)
+                if isinstance(outcome, BaseException)
+            }
+
+            if failures:
+                # Checked before the wave-boundary flush: a failure must never be
+                # checkpointed away. Non-activity errors (e.g. a malformed step) don't
+                # set failed_step_id themselves, so pin the first one in plan order.
+                if self.failed_step_id not in failures:
+                    self.failed_step_id = next(iter(failures))
+                raise failures[self.failed_step_id]
+
+            # Wave boundary: no step in flight - safe continue-as-new checkpoint
+            await self._flush_events()
+
+    async def _execute_step(self, idx: int, step: dict[str, Any]) -> None:
+        """
+        Execute a single plan step with Saga compensation and record its event.
 
-            # Execute with Saga compensation
-            try:
+        One fused ToolCallCompleted event is recorded once the activity settles
+        (instead of a request + result pair); in-flight steps are exposed through
+        the get_in_flight_steps query rather than history.
+        """
+        step_id = _step_id_for(step, idx)
+
+        step_name = step.get("name", step_id)
+        workflow.logger.info("▶ Executing step %d/%d: %s", idx + 1, len(self.plan_steps), step_name)
+
+        # Execute with Saga compensation (read-only steps have nothing to register)
+        started_at = workflow.now()
+        self._in_flight_steps[step_id] = {"tool": step["tool"], "started_at": _iso(started_at)}
+        try:
+            if step.get("compensation"):
                 result = await self.saga.execute_with_compensation(
                     activity_name=step["tool"],
                     activity_input=step.get("input", {}),
-                    compensation_activity=step.get("compensation"),
+                    compensation_activity=step["compensation"],
                     compensation_input=step.get("compensation_input"),
                     step_id=step_id,
+                    compensation_independent=step.get("compensation_independent", False),
+                    needs_injection=step.get("_needs_injection"),
                 )
+            else:
+                result = await self._execute_activity(step["tool"], step.get("input", {}), step_id)
 
-                # Record success
-                await self._append_event(
-                    ToolResultReceived(
-                        correlation_id=workflow.info().workflow_id,
-                        tool_name=step["tool"],
-                        step_id=step_id,
-                        success=True,
-                        result=result,
-                    )
-                )
+        except ActivityError as e:
+            # Step failed after retries - trigger rollback (first failure wins)
+            if not self.failed_step_id:
+                self.failed_step_id = step_id
+            self._queue_event(
+                self._tool_call_completed(step, step_id, started_at, success=False, error=str(e))
+            )
 
-                self.step_results[step_id] = result
-
-            except ActivityError as e:
-                # Step failed after retries - trigger rollback
-                await self._append_event(
-                    ToolResultReceived(
-                        correlation_id=workflow.info().workflow_id,
-                        tool_name=step["tool"],
-                        step_id=step_id,
-                        success=False,
-                        error=str(e),
-                    )
-                )
+            raise  # Re-raise to trigger workflow failure
+
+        finally:
+            del self._in_flight_steps[step_id]
+
+        # Step is fully settled before the success event (checkpoint-safe)
+        self._record_step_result(step_id, result)
+
+        # Record success (digest only - full result lives in step_results)
+        digest, size, preview = _summarize_result(result)
+        self._queue_event(
+            self._tool_call_completed(
+                step,
+                step_id,
+                started_at,
+                success=True,
+                result_digest=digest,
+                result_size=size,
+                result_preview=preview,
+            )
+        )
 
-                self.failed_step_id = step_id
-                raise  # Re-raise to trigger workflow failure
+    def _tool_call_completed(
+        self,
+        step: dict[str, Any],
+        step_id: str,
+        started_at: datetime,
+        **outcome: Any,
+    ) -> ToolCallCompleted:
+        """Build the fused tool-call event; timestamps come from replay-safe workflow.now()."""
+        ended_at = workflow.now()
+        return ToolCallCompleted(
+            correlation_id=self._correlation_id,
+            tool_name=step["tool"],
+            tool_input=step.get("input", {}),
+            step_id=step_id,
+            compensation_activity=step.get("compensation"),
+            started_at=_iso(started_at),
+            ended_at=_iso(ended_at),
+            duration_ms=int((ended_at - started_at).total_seconds() * 1000),
+            **outcome,
+        )
 
     async def _handle_success(self) -> dict[str, Any]:
         """Handle successful workflow completion."""
@@ -475,29 +848,33 @@ class AgentWorkflow:
         result = {
             "status": "completed",
             "plan_id": self.plan_id,
-            "steps_executed": len(self.plan_steps),
+            "steps_executed": len(self._step_ids),
             "results": self.step_results,
         }
 
-        await self._append_event(
+        self._queue_event(
             WorkflowCompleted(
-                correlation_id=workflow.info().workflow_id,
+                correlation_id=self._correlation_id,
                 plan_id=self.plan_id,
-                total_steps=len(self.plan_steps),
+                total_steps=len(self._step_ids),
                 duration_seconds=0.0,  # TODO: Calculate from start time
                 final_result=result,
             )
         )
+        await self._flush_events()
 
         return result
 
     async def _handle_failure(self, error_message: str) -> dict[str, Any]:
         """Handle workflow failure with Saga rollback."""
-        workflow.logger.error(f"✗ Handling workflow failure: {error_message}")
+        workflow.logger.error("✗ Handling workflow failure: %s", error_message)
 
         # Execute compensations
         compensation_results = await self.saga.rollback()
 
+        # Apply events queued before the failure (rollback already blocks checkpoints)
+        await self._flush_events()
+
         result = {
             "status": "failed",
             "plan_id": self.plan_id,
@@ -507,9 +884,9 @@ class AgentWorkflow:
             "compensation_results": compensation_results,
         }
 
-        await self._append_event(
+        self._queue_event(
             WorkflowFailed(
-                correlation_id=workflow.info().workflow_id,
+                correlation_id=self._correlation_id,
                 plan_id=self.plan_id,
                 failed_step_id=self.failed_step_id,
                 error_message=error_message,
@@ -517,14 +894,27 @@ class AgentWorkflow:
                 compensation_results=compensation_results,
             )
         )
+        await self._flush_events()
 
         return result
 
-    async def _append_event(self, event: AgentEvent) -> None:
+    def _queue_event(self, event: AgentEvent) -> None:
+        """
+        Queue event for derived-state application (Event Sourcing).
+
+        Events are buffered and applied in batches by _flush_events() at activity
+        boundaries, so tight loops pay for one state-update pass + threshold check
+        per batch instead of per event.
         """
-        Append event to event log (Event Sourcing).
+        self._event_buffer.append(event)
 
-        Also checks for continue-as-new threshold to prevent runaway history.
+    async def _flush_events(self) -> None:
+        """
+        Apply buffered events to derived state and audit counters.
+
+        Called before every activity is scheduled (Temporal's determinism points),
+        before derived state is read, and between plan waves. Also checks for
+        continue-as-new threshold to prevent runaway history.
 
         Why continue-as-new:
         - Temporal workflows store full event history
@@ -532,23 +922,123 @@ class AgentWorkflow:
         - Continue-as-new snapshots state and starts fresh workflow
         - Old history is archived, new workflow continues from checkpoint
         """
-        self.events.append(event)
-
-        # Update derived state based on event type
-        if isinstance(event, GoalReceived):
-            self.goal = event.goal
-            self.user_id = event.user_id
-        elif isinstance(event, PlanGenerated):
-            self.plan_id = event.plan_id
-            self.plan_steps = event.steps
-
-        # Check for continue-as-new threshold
-        if len(self.events) >= self.MAX_HISTORY_SIZE:
+        if not self._event_buffer:
+            return
+
+        batch, self._event_buffer = self._event_buffer, []
+        self._event_count += len(batch)
+
+        # Update derived state based on event type. Event classes are leaves,
+        # so an exact-class lookup is enough (no MRO fallback needed)
+        handlers = self._event_handlers
+        counts = self._event_counts
+        for event in batch:
+            event_cls = event.__class__
+            event_name = event_cls.__name__
+            counts[event_name] = counts.get(event_name, 0) + 1
+            handler = handlers.get(event_cls)
+            if handler:
+                handler(event)
+
+        # Check for continue-as-new threshold (once per batch). Executions started before
+        # checkpointing existed never continued-as-new, and must replay without it
+        if (
+            self._event_count >= self.MAX_HISTORY_SIZE
+            and self._is_safe_checkpoint_boundary()
+            and workflow.patched(_PATCH_CONTINUE_AS_NEW)
+        ):
             workflow.logger.warning(
-                f"Event history size ({len(self.events)}) exceeded threshold "
-                f"({self.MAX_HISTORY_SIZE}) - triggering continue-as-new"
+                "Event history size (%d) exceeded threshold (%d) - triggering continue-as-new",
+                self._event_count,
+                self.MAX_HISTORY_SIZE,
             )
-            # await self._continue_as_new()  # TODO: Implement snapshotting
+            await self._continue_as_new()
+
+    def _is_safe_checkpoint_boundary(self) -> bool:
+        """
+        True when state can be snapshotted without losing in-flight work.
+
+        Safe = plan is mid-execution, no step is running, and no failure/rollback started.
+        """
+        return (
+            self.saga is not None
+            and not self.saga.rollback_executed
+            and not self.failed_step_id
+            and not self._in_flight_steps
+            and bool(self._remaining_steps())
+        )
+
+    def _remaining_steps(self) -> list[dict[str, Any]]:
+        """Plan steps without a recorded result, with default step IDs pinned."""
+        remaining = []
+        for idx, step in enumerate(self.plan_steps):
+            step_id = _step_id_for(step, idx)
+            if step_id not in self._step_index:
+                remaining.append({**step, "id": step_id})
+        return remaining
+
+    async def _continue_as_new(self) -> None:
+        """
+        Snapshot execution state and continue as a fresh workflow run.
+
+        The checkpoint only carries what remaining steps need (plan_id, pending steps,
+        step results, compensation stack), so the new run replays O(checkpoint)
+        instead of O(full history).
+
+        Raises:
+            ContinueAsNewError: Always (Temporal restarts the workflow with the snapshot)
+        """
+        assert self.saga is not None  # Only reached mid-plan (see _is_safe_checkpoint_boundary)
+        snapshot = {
+            "plan_id": self.plan_id,
+            "explicit_dependencies": self._explicit_dependencies,
+            "remaining_steps": self._remaining_steps(),
+            "step_results": self.step_results,
+            "compensation_stack": [asdict(c) for c in self.saga.compensation_stack],
+        }
+        workflow.continue_as_new(args=[self.goal, self.user_id, {"resume": snapshot}])
+
+    def _restore_checkpoint(self, goal: str, user_id: str, snapshot: dict[str, Any]) -> None:
+        """Rebuild derived state from a continue-as-new snapshot."""
+        self.goal = goal
+        self.user_id = user_id
+        self.plan_id = snapshot["plan_id"]
+        self._explicit_dependencies = snapshot.get("explicit_dependencies", False)
+        self.plan_steps = [self._compile_step(step) for step in snapshot["remaining_steps"]]
+        for step_id, result in snapshot["step_results"].items():
+            self._record_step_result(step_id, result)
+        assert self.saga is not None  # run() creates the saga before restoring
+        self.saga.compensation_stack = [
+            CompensationStep(**c) for c in snapshot["compensation_stack"]
+        ]
+        workflow.logger.info(
+            "↻ Resumed from checkpoint: plan=%s (%d steps remaining)",
+            self.plan_id,
+            len(self.plan_steps),
+        )
+
+    def _apply_goal(self, event: GoalReceived) -> None:
+        """Derive goal state from GoalReceived."""
+        self.goal = event.goal
+        self.user_id = event.user_id
+
+    def _apply_plan(self, event: PlanGenerated) -> None:
+        """Derive plan state from PlanGenerated."""
+        self.plan_id = event.plan_id
+        self._explicit_dependencies = event.explicit_dependencies
+        self.plan_steps = [self._compile_step(step) for step in event.steps]
+
+    @staticmethod
+    def _compile_step(step: dict[str, Any]) -> dict[str, Any]:
+        """Copy of step with compensation placeholders pre-compiled (event stays untouched)."""
+        if not step.get("compensation_input"):
+            return step
+        compiled = SagaContext.compile_compensation_input(step["compensation_input"])
+        return {
+            **step,
+            "compensation_input": compiled,
+            "_needs_injection": SagaContext.has_result_refs(compiled),
+        }
 
     async def _execute_activity(
         self,
@@ -562,20 +1052,20 @@ class AgentWorkflow:
 
         Activities are the ONLY way to perform I/O in workflows (determinism requirement).
         """
-        timeout = timedelta(seconds=30)
+        await self._flush_events()
+
         if is_compensation:
-            timeout = timedelta(seconds=15)  # Shorter timeout for compensations
+            timeout = self._COMPENSATION_TIMEOUT
+            retry_policy = self._COMPENSATION_RETRY_POLICY
+        else:
+            timeout = self._ACTIVITY_TIMEOUT
+            retry_policy = self._ACTIVITY_RETRY_POLICY
 
         result = await workflow.execute_activity(
             activity_name,
             args=[activity_input],
             start_to_close_timeout=timeout,
-            retry_policy=RetryPolicy(
-                maximum_attempts=3 if not is_compensation else 2,
-                initial_interval=timedelta(seconds=1),
-                backoff_coefficient=2.0,
-                maximum_interval=timedelta(seconds=10),
-            ),
+            retry_policy=retry_policy,
         )
 
         return result